@@ -27,6 +27,7 @@ import logging
 import os
 import sys
 import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Any, Optional
@@ -53,6 +54,13 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _build_and_save_batch(receipts: List[Dict[str, Any]], images_dir: Path,
+                          excel_path: Path, categories_file: Path) -> Path:
+    """Build one batch workbook and save it (runs in a worker process)"""
+    generator = ExcelGenerator(categories_file)
+    wb = generator.create_batch_workbook(receipts, images_dir)
+    wb.save(excel_path)
+    return excel_path
 
 
 class ReceiptExtractor:
@@ -65,7 +73,8 @@ class ReceiptExtractor:
         model: str,
         max_concurrent: int = 100,
         receipts_per_file: int = 100,
-        period: Optional[str] = None
+        period: Optional[str] = None,
+        cache_dir: Optional[Path] = None
     ):
         """Initialize the extractor"""
         self.api_key = api_key
@@ -80,10 +89,10 @@ class ReceiptExtractor:
         self.extraction_prompt_dir = Path(__file__).parent / 'docs' / 'extraction-prompt'
         
         # Initialize components
-        self.openai_client = OpenAIClient(api_key, model)
+        self.openai_client = OpenAIClient(api_key, model, cache_dir=cache_dir)
         # Pass the categories file to ExcelGenerator for category validation (dropdown)
-        categories_file = self.extraction_prompt_dir / '001-icount-categories.md'
-        self.excel_generator = ExcelGenerator(categories_file)
+        self.categories_file = self.extraction_prompt_dir / '001-icount-categories.md'
+        self.excel_generator = ExcelGenerator(self.categories_file)
         
         # Setup output directories
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -134,42 +143,50 @@ class ReceiptExtractor:
 
     def _find_receipt_files(self, receipts_dir: Path) -> List[Path]:
         """Find all supported receipt files in directory"""
-        receipt_files = []
-        
-        for file_path in receipts_dir.iterdir():
-            if file_path.is_file() and ImageHandler.is_supported_file(file_path):
-                receipt_files.append(file_path)
-                
+        # scandir reuses the directory entry's cached type info, avoiding a
+        # stat syscall per file that iterdir + is_file() would pay
+        with os.scandir(receipts_dir) as entries:
+            receipt_files = [
+                Path(entry.path) for entry in entries
+                if entry.is_file() and ImageHandler.is_supported_file(Path(entry.name))
+            ]
+
         # Sort files for consistent ordering
         receipt_files.sort()
-        
+
         return receipt_files
         
     async def _process_receipts_parallel(self, receipt_files: List[Path]) -> List[Dict[str, Any]]:
         """Process receipts in parallel with concurrency control"""
-        semaphore = asyncio.Semaphore(self.max_concurrent)
-        
-        async def process_with_semaphore(receipt_path: Path) -> Dict[str, Any]:
-            async with semaphore:
-                return await self._process_single_receipt(receipt_path)
-                
-        tasks = [process_with_semaphore(receipt) for receipt in receipt_files]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Process results and handle exceptions
-        processed_results = []
-        for idx, result in enumerate(results):
-            if isinstance(result, Exception):
-                logger.error(f"Error processing {receipt_files[idx]}: {result}")
-                processed_results.append({
-                    'status': 'error',
-                    'file_path': str(receipt_files[idx]),
-                    'error': str(result)
-                })
-            else:
-                processed_results.append(result)
-                
-        return processed_results
+        # A fixed pool of workers pulling from a queue keeps only
+        # O(max_concurrent) tasks alive, instead of materializing a task (and
+        # semaphore waiter) per file up front as gather-over-all-files would
+        queue: asyncio.Queue = asyncio.Queue()
+        for idx, receipt_file in enumerate(receipt_files):
+            queue.put_nowait((idx, receipt_file))
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(receipt_files)
+
+        async def worker():
+            while True:
+                try:
+                    idx, receipt_file = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    results[idx] = await self._process_single_receipt(receipt_file)
+                except Exception as e:
+                    logger.error(f"Error processing {receipt_file}: {e}")
+                    results[idx] = {
+                        'status': 'error',
+                        'file_path': str(receipt_file),
+                        'error': str(e)
+                    }
+
+        worker_count = min(self.max_concurrent, len(receipt_files))
+        await asyncio.gather(*(worker() for _ in range(worker_count)))
+
+        return results
         
     async def _process_single_receipt(self, receipt_path: Path) -> Dict[str, Any]:
         """Process a single receipt file"""
@@ -178,18 +195,21 @@ class ReceiptExtractor:
         try:
             # Raster-only PDFs (e.g. Weezmo receipts) read poorly as raw PDF; use
             # their crisp embedded bitmap for both the API and the Excel image.
-            bitmap = ImageHandler.extraction_bitmap(receipt_path)
+            # PIL/poppler work blocks, so it runs off the event loop - otherwise
+            # each decode would stall every in-flight API call.
+            bitmap = await asyncio.to_thread(ImageHandler.extraction_bitmap, receipt_path)
             if bitmap is not None:
                 image = bitmap
             else:
-                images = ImageHandler.process_file(receipt_path)
+                # Only the first PDF page is used, so don't rasterize the rest
+                images = await asyncio.to_thread(
+                    ImageHandler.process_file, receipt_path, max_pages=1)
                 image = images[0] if images else None
 
-            # For PDFs with multiple pages, process first page only
             if image is not None:
                 # Save processed image for Excel
                 image_output_path = self.images_dir / receipt_path.with_suffix('.jpg').name
-                ImageHandler.save_image_for_excel(image, image_output_path)
+                await asyncio.to_thread(ImageHandler.save_image_for_excel, image, image_output_path)
 
                 # Extract data using OpenAI
                 request_data = {
@@ -245,34 +265,31 @@ class ReceiptExtractor:
             
     def _generate_excel_batches(self, results: List[Dict[str, Any]]) -> List[Path]:
         """Generate Excel files in batches for successful and failed receipts"""
-        excel_files = []
-        
-        # Filter successful and failed results
-        successful_results = [r for r in results if r.get('status') == 'success']
-        failed_results = [r for r in results if r.get('status') == 'error']
-        
-        # Create batches for successful results
+
+        # One timestamp for the whole run so all batch files share a stamp
+        # (and two batches can't straddle a second boundary)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+        # Partition by status in a single pass
+        successful_results, failed_results = [], []
+        for r in results:
+            if r.get('status') == 'success':
+                successful_results.append(r)
+            elif r.get('status') == 'error':
+                failed_results.append(r)
+
+        # Plan all batches (receipts, output path) before building any workbook
+        batch_plan: List[tuple[List[Dict[str, Any]], Path]] = []
+
         for i in range(0, len(successful_results), self.receipts_per_file):
             batch = successful_results[i:i + self.receipts_per_file]
-            
-            # Generate Excel file for batch
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             batch_num = (i // self.receipts_per_file) + 1
             excel_path = self.output_dir / f'receipts_batch_{batch_num:03d}_{timestamp}.xlsx'
-            
-            try:
-                wb = self.excel_generator.create_batch_workbook(batch, self.images_dir)
-                wb.save(excel_path)
-                excel_files.append(excel_path)
-                logger.info(f"Generated Excel file: {excel_path}")
-                
-            except Exception as e:
-                logger.error(f"Error generating Excel batch {batch_num}: {e}")
-                
-        # Create batches for failed results with empty data
+            batch_plan.append((batch, excel_path))
+
         for i in range(0, len(failed_results), self.receipts_per_file):
             batch = failed_results[i:i + self.receipts_per_file]
-            
+
             # Convert failed results to empty receipt format
             empty_batch = []
             for failed_result in batch:
@@ -300,21 +317,47 @@ class ReceiptExtractor:
                     '_processing_error': failed_result.get('error', 'Unknown error')
                 }
                 empty_batch.append(empty_receipt)
-            
-            # Generate Excel file for failed batch
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
             batch_num = (i // self.receipts_per_file) + 1
             excel_path = self.output_dir / f'receipts_batch_failed_{batch_num:03d}_{timestamp}.xlsx'
-            
-            try:
-                wb = self.excel_generator.create_batch_workbook(empty_batch, self.images_dir)
-                wb.save(excel_path)
-                excel_files.append(excel_path)
-                logger.info(f"Generated failed receipts Excel file: {excel_path}")
-                
-            except Exception as e:
-                logger.error(f"Error generating failed Excel batch {batch_num}: {e}")
-                
+            batch_plan.append((empty_batch, excel_path))
+
+        return self._build_planned_batches(batch_plan)
+
+    def _build_planned_batches(self, batch_plan: List[tuple]) -> List[Path]:
+        """Build and save the planned workbooks, in parallel when it pays off"""
+        if not batch_plan:
+            return []
+
+        excel_files = []
+
+        # openpyxl workbook construction is pure-Python and CPU-bound, so
+        # independent batches are built in worker processes; a single batch
+        # (the common case) stays in-process to skip the fork/pickle overhead
+        if len(batch_plan) > 1:
+            with ProcessPoolExecutor(
+                    max_workers=min(len(batch_plan), os.cpu_count() or 1)) as pool:
+                futures = [
+                    pool.submit(_build_and_save_batch, batch, self.images_dir,
+                                excel_path, self.categories_file)
+                    for batch, excel_path in batch_plan
+                ]
+                for (_, excel_path), future in zip(batch_plan, futures):
+                    try:
+                        excel_files.append(future.result())
+                        logger.info(f"Generated Excel file: {excel_path}")
+                    except Exception as e:
+                        logger.error(f"Error generating Excel batch {excel_path.name}: {e}")
+        else:
+            for batch, excel_path in batch_plan:
+                try:
+                    wb = self.excel_generator.create_batch_workbook(batch, self.images_dir)
+                    wb.save(excel_path)
+                    excel_files.append(excel_path)
+                    logger.info(f"Generated Excel file: {excel_path}")
+                except Exception as e:
+                    logger.error(f"Error generating Excel batch {excel_path.name}: {e}")
+
         return excel_files
         
     def _generate_summary(
@@ -325,12 +368,31 @@ class ReceiptExtractor:
         end_time: datetime
     ) -> Dict[str, Any]:
         """Generate processing summary"""
-        
-        successful = len([r for r in results if r.get('status') == 'success'])
-        failed = len([r for r in results if r.get('status') == 'error'])
-        
+
+        # Single pass over results: status counts, failure details and token
+        # totals together, instead of one scan per statistic
+        successful = failed = calls_with_usage = 0
+        failed_files = []
+        totals = {'input_tokens': 0, 'cached_input_tokens': 0,
+                  'output_tokens': 0, 'reasoning_tokens': 0, 'total_tokens': 0}
+        for r in results:
+            status = r.get('status')
+            if status == 'success':
+                successful += 1
+            elif status == 'error':
+                failed += 1
+                failed_files.append({
+                    'file': r.get('file_path'),
+                    'error': r.get('error')
+                })
+            usage = (r.get('api_metadata') or {}).get('usage')
+            if usage:
+                calls_with_usage += 1
+                for key in totals:
+                    totals[key] += usage.get(key, 0) or 0
+
         summary = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': end_time.isoformat(),
             'total_files': len(results),
             'successful': successful,
             'failed': failed,
@@ -344,16 +406,7 @@ class ReceiptExtractor:
             }
         }
         
-        # Aggregate token usage and estimated cost across all calls
-        totals = {'input_tokens': 0, 'cached_input_tokens': 0,
-                  'output_tokens': 0, 'reasoning_tokens': 0, 'total_tokens': 0}
-        calls_with_usage = 0
-        for r in results:
-            usage = (r.get('api_metadata') or {}).get('usage')
-            if usage:
-                calls_with_usage += 1
-                for key in totals:
-                    totals[key] += usage.get(key, 0) or 0
+        # Token usage and estimated cost (aggregated in the pass above)
         if calls_with_usage:
             summary['token_usage'] = totals
             cost = estimate_cost_usd(self.model, totals)
@@ -361,14 +414,8 @@ class ReceiptExtractor:
                 summary['estimated_cost_usd'] = round(cost, 4)
 
         # Add failed files details
-        if failed > 0:
-            summary['failed_files'] = [
-                {
-                    'file': r.get('file_path'),
-                    'error': r.get('error')
-                }
-                for r in results if r.get('status') == 'error'
-            ]
+        if failed_files:
+            summary['failed_files'] = failed_files
 
         return summary
 
@@ -420,6 +467,13 @@ async def main():
         help='Reporting period as YYYY-MM; receipts dated outside the bi-monthly '
              'VAT period containing this month are flagged for review'
     )
+    parser.add_argument(
+        '--cache-dir',
+        type=Path,
+        default=None,
+        help='Directory for the on-disk response cache; reruns of unchanged '
+             'receipts reuse stored responses instead of new API calls'
+    )
 
     args = parser.parse_args()
     
@@ -450,13 +504,18 @@ async def main():
         model=args.model,
         max_concurrent=args.concurrent,
         receipts_per_file=args.receipts_per_file,
-        period=args.period
+        period=args.period,
+        cache_dir=args.cache_dir
     )
     
     # Process receipts
     logger.info(f"Starting receipt extraction from {args.receipts_dir}")
     summary = await extractor.process_receipts(args.receipts_dir)
-    
+
+    if summary.get('status') == 'error':
+        logger.error(summary.get('message', 'Extraction failed'))
+        return 1
+
     # Print summary
     print("\n" + "="*60)
     print("PROCESSING COMPLETE")
@@ -490,6 +549,8 @@ async def main():
     
     print(f"Summary saved to: {output_dir / 'llm_logs'} (processing_summary_*.yaml)")
 
+    return 0
+
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
@@ -6,9 +6,20 @@ import yaml
 from pathlib import Path
 from typing import Dict, List, Tuple, Any, Optional
 import logging
+from openpyxl.utils import get_column_letter
+
+# libyaml's C parser when the wheel ships it; same semantics as safe_load
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
 
 logger = logging.getLogger(__name__)
 
+# Parsed-config cache keyed by (path, mtime_ns): repeated ExcelLayoutConfig
+# constructions (batch workers, tests) reuse one parse, edits invalidate
+_parsed_config_cache: Dict[tuple, Dict[str, Any]] = {}
+
 
 class ExcelLayoutConfig:
     """Loads and provides access to Excel layout configuration"""
@@ -26,70 +37,71 @@ class ExcelLayoutConfig:
         self.config_path = config_path
         self.config = self._load_config()
 
+        # Top-level sections bound once so the per-call accessors below do a
+        # single attribute hop instead of re-walking the nested dict
+        self._header_section = self.config['header_section']
+        self._line_items_section = self.config['line_items_section']
+        self._formatting = self.config['formatting']
+        self._text_messages = self.config['text_messages']
+
+        # Hot scalar leaves bound as plain attributes: these are read per
+        # receipt (and per line item) by the generator and both parsers, so
+        # they skip the descriptor call and dict hop entirely
+        self.header_start_row = self._header_section['start_row']
+        self.header_field_column = self._header_section['field_column']
+        self.header_value_column = self._header_section['value_column']
+        self.header_max_rows = self._header_section['max_rows']
+        self.line_items_header_row = self._line_items_section['header_row']
+        self.line_items_start_row = self._line_items_section['data_start_row']
+        self.line_items_max_row = self._line_items_section['max_rows']
+
+        # Derived views computed once - their getters are hit per worksheet
+        # (get_header_cell_reference alone rebuilds the field list per lookup)
+        self._field_mappings = {mapping['hebrew']: mapping['english']
+                                for mapping in self.config['field_mappings']}
+        self._header_fields = [(mapping['hebrew'], mapping['english'])
+                               for mapping in self.config['field_mappings']]
+        title_row = self.config['formatting']['header_section']['title_row']
+        title_columns = self.config['formatting']['header_section']['title_columns']
+        self._title_cells = [self.get_cell_reference(title_row, col)
+                             for col in range(1, title_columns + 1)]
+        self._header_field_rows = {english: self.header_start_row + i
+                                   for i, (_, english) in enumerate(self._header_fields)}
+        self._line_item_col_letters = {
+            field: get_column_letter(col)
+            for field, col in self.config['line_items_section']['columns'].items()}
+        total_check = self.config['formulas']['verification']['total_check']
+        self._total_check_formula = (
+            f"={self.get_header_cell_reference(total_check['excl_vat_field'])}"
+            f"+{self.get_header_cell_reference(total_check['vat_field'])}")
+
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from YAML file"""
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-            logger.debug(f"Loaded Excel configuration from {self.config_path}")
+            cache_key = (str(self.config_path), self.config_path.stat().st_mtime_ns)
+            config = _parsed_config_cache.get(cache_key)
+            if config is None:
+                with open(self.config_path, 'rb') as f:
+                    config = yaml.load(f, Loader=_SafeLoader)
+                _parsed_config_cache[cache_key] = config
+                logger.debug(f"Loaded Excel configuration from {self.config_path}")
             return config
         except Exception as e:
             logger.error(f"Failed to load Excel configuration from {self.config_path}: {e}")
             raise
 
-    # Header section properties
-    @property
-    def header_start_row(self) -> int:
-        """First row for header fields"""
-        return self.config['header_section']['start_row']
-
-    @property
-    def header_field_column(self) -> int:
-        """Column for header field names (Hebrew)"""
-        return self.config['header_section']['field_column']
-
-    @property
-    def header_value_column(self) -> int:
-        """Column for header field values"""
-        return self.config['header_section']['value_column']
-
-    @property
-    def header_max_rows(self) -> int:
-        """Maximum rows to search for header fields"""
-        return self.config['header_section']['max_rows']
-
-    # Line items section properties
-    @property
-    def line_items_header_row(self) -> int:
-        """Row containing line item column headers"""
-        return self.config['line_items_section']['header_row']
-
-    @property
-    def line_items_start_row(self) -> int:
-        """First row for line item data"""
-        return self.config['line_items_section']['data_start_row']
-
-    @property
-    def line_items_max_row(self) -> int:
-        """Maximum row for line item processing"""
-        return self.config['line_items_section']['max_rows']
-
     def get_line_item_column(self, field: str) -> int:
         """Get column number for a line item field"""
-        return self.config['line_items_section']['columns'][field]
+        return self._line_items_section['columns'][field]
 
     # Field mappings
     def get_field_mappings(self) -> Dict[str, str]:
         """Get Hebrew to English field mappings as dict"""
-        mappings = {}
-        for mapping in self.config['field_mappings']:
-            mappings[mapping['hebrew']] = mapping['english']
-        return mappings
+        return self._field_mappings
 
     def get_header_fields(self) -> List[Tuple[str, str]]:
         """Get header fields as list of (hebrew, english) tuples"""
-        return [(mapping['hebrew'], mapping['english'])
-                for mapping in self.config['field_mappings']]
+        return self._header_fields
 
     def get_line_item_headers(self) -> List[str]:
         """Get line item column headers in Hebrew"""
@@ -112,20 +124,13 @@ class ExcelLayoutConfig:
 
     def get_verification_formula(self, formula_name: str, **kwargs) -> str:
         """Get verification formula with substituted parameters"""
-        formula_config = self.config['formulas']['verification'][formula_name]
-
         if formula_name == 'total_check':
-            # For total_check, we need to generate cell references for header fields
-            excl_vat_field = formula_config['excl_vat_field']
-            vat_field = formula_config['vat_field']
-
-            # Get cell references for these header fields
-            excl_vat_cell = self.get_header_cell_reference(excl_vat_field)
-            vat_cell = self.get_header_cell_reference(vat_field)
-
-            return f"={excl_vat_cell}+{vat_cell}"
+            # Both referenced header cells are config-static, so the formula
+            # is assembled once at load
+            return self._total_check_formula
 
         # For other formula types, use the provided kwargs
+        formula_config = self.config['formulas']['verification'][formula_name]
         return str(formula_config).format(**kwargs)
 
     # Conditional formatting utilities
@@ -169,14 +174,11 @@ class ExcelLayoutConfig:
     # Cell reference utilities
     def get_cell_reference(self, row: int, column: int) -> str:
         """Convert row/column numbers to Excel cell reference (e.g., A1)"""
-        from openpyxl.utils import get_column_letter
         return f"{get_column_letter(column)}{row}"
 
     def get_column_letter_for_field(self, field_name: str) -> str:
         """Convert field name to Excel column letter using line items column mapping"""
-        from openpyxl.utils import get_column_letter
-        column_number = self.get_line_item_column(field_name)
-        return get_column_letter(column_number)
+        return self._line_item_col_letters[field_name]
 
     def get_dynamic_range(self, field_name: str, start_row: Optional[int] = None,
                          end_row: Optional[int] = None) -> str:
@@ -195,29 +197,22 @@ class ExcelLayoutConfig:
         return f"{column_letter}{row}"
 
     def get_title_cells(self) -> List[str]:
-        """Generate title cell references dynamically"""
-        title_row = self.config['formatting']['header_section']['title_row']
-        title_columns = self.config['formatting']['header_section']['title_columns']
-
-        from openpyxl.utils import get_column_letter
-        return [f"{get_column_letter(col)}{title_row}" for col in range(1, title_columns + 1)]
+        """Get title cell references (precomputed at load)"""
+        return self._title_cells
 
     def get_image_position_cell(self) -> str:
         """Generate image position cell reference dynamically"""
-        start_column = self.config['formatting']['image_section']['start_column']
-        start_row = self.config['formatting']['image_section']['start_row']
-
-        from openpyxl.utils import get_column_letter
-        return f"{get_column_letter(start_column)}{start_row}"
+        image_section = self._formatting['image_section']
+        return f"{get_column_letter(image_section['start_column'])}{image_section['start_row']}"
 
     def get_image_merge_range(self) -> str:
         """Generate image merge range dynamically"""
-        start_column = self.config['formatting']['image_section']['start_column']
-        start_row = self.config['formatting']['image_section']['start_row']
-        merge_columns = self.config['formatting']['image_section']['merge_columns']
-        merge_rows = self.config['formatting']['image_section']['merge_rows']
+        image_section = self._formatting['image_section']
+        start_column = image_section['start_column']
+        start_row = image_section['start_row']
+        merge_columns = image_section['merge_columns']
+        merge_rows = image_section['merge_rows']
 
-        from openpyxl.utils import get_column_letter
         start_cell = f"{get_column_letter(start_column)}{start_row}"
         end_column = start_column + merge_columns - 1
         end_row = start_row + merge_rows - 1
@@ -232,14 +227,11 @@ class ExcelLayoutConfig:
             field_english: English field name
             value: If True, return value column. If False, return field name column.
         """
-        # Find the row for this field
-        for i, (hebrew, english) in enumerate(self.get_header_fields()):
-            if english == field_english:
-                row = self.header_start_row + i
-                column = self.header_value_column if value else self.header_field_column
-                return self.get_cell_reference(row, column)
-
-        raise ValueError(f"Field '{field_english}' not found in configuration")
+        row = self._header_field_rows.get(field_english)
+        if row is None:
+            raise ValueError(f"Field '{field_english}' not found in configuration")
+        column = self.header_value_column if value else self.header_field_column
+        return self.get_cell_reference(row, column)
 
     # Document type methods
     def get_document_types(self) -> List[str]:
@@ -295,7 +287,7 @@ class ExcelLayoutConfig:
     # Text message methods
     def get_text_message(self, message_key: str, **kwargs) -> str:
         """Get text message by key, with optional formatting"""
-        message = self.config['text_messages'].get(message_key, '')
+        message = self._text_messages.get(message_key, '')
         if kwargs and message:
             return message.format(**kwargs)
         return message
@@ -307,7 +299,7 @@ class ExcelLayoutConfig:
         Single source of truth: the generator writes this row, and both readers
         (audit_batch, consolidator) stop at it so it is never parsed as an item.
         """
-        return self.config['text_messages']['line_items_sum_label']
+        return self._text_messages['line_items_sum_label']
 
     # Category settings methods
     def get_category_skip_items(self) -> List[str]:
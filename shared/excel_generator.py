@@ -4,6 +4,7 @@
 
 import logging
 import re
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from decimal import Decimal
@@ -22,6 +23,23 @@ from openpyxl.workbook.defined_name import DefinedName
 
 logger = logging.getLogger(__name__)
 
+# Category names sit in the first column of the markdown tables
+# (more restrictive pattern): | **category_name** | at the start of a line
+_CATEGORY_RE = re.compile(r'\|\s*\*\*([^*]+)\*\*\s*\|')
+
+
+@lru_cache(maxsize=8)
+def _read_category_matches(path_str: str, mtime_ns: int) -> tuple:
+    """Category-table matches from the markdown, cached by (path, mtime).
+
+    The file is constant within (and across) runs, so repeated ExcelGenerator
+    constructions share one read+parse; mtime in the key keeps edits visible.
+    Scanned line by line so only one line is ever held beyond the matches.
+    """
+    with open(path_str, encoding='utf-8') as f:
+        return tuple(m.group(1).strip()
+                     for m in map(_CATEGORY_RE.match, f) if m)
+
 
 class ExcelGenerator:
     """Generate Excel files for receipt data"""
@@ -34,6 +52,47 @@ class ExcelGenerator:
         self.config = get_excel_config()
         # Load categories after config is set
         self.categories = self._load_categories()
+
+        # Shared style objects - openpyxl styles are immutable, so a single
+        # instance can serve every cell; per-cell construction only bloats the
+        # workbook's style table and the allocator
+        error_color = self.config.get_color('error')
+        header_bg = self.config.config['formatting']['line_items_section']['header_background_color']
+        self._bold_font = Font(bold=True)
+        self._error_font = Font(color=error_color)
+        self._bold_error_font = Font(bold=True, color=error_color)
+        self._warning_font = Font(color=self.config.get_color('warning'))
+        self._hyperlink_font = Font(color=self.config.get_color('hyperlink'), underline="single")
+        self._title_fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+        self._line_header_fill = PatternFill(start_color=header_bg, end_color=header_bg, fill_type="solid")
+        self._vat_warning_fill = PatternFill(start_color=self.config.get_color('vat_validation'),
+                                             end_color=self.config.get_color('vat_validation'),
+                                             fill_type="solid")
+        self._non_deductible_fill = PatternFill(start_color=self.config.get_color('non_deductible'),
+                                                end_color=self.config.get_color('non_deductible'),
+                                                fill_type="solid")
+        self._wrap_top = Alignment(wrap_text=True, vertical='top')
+
+        # Conditional-formatting rules are config-static, so one rule object
+        # per color serves every worksheet - openpyxl then dedupes the
+        # differential style instead of writing an identical dxf per sheet
+        self._vat_validation_cf = (
+            self.config.get_conditional_formatting_range('vat_validation'),
+            FormulaRule(formula=[self.config.get_conditional_formatting_formula('vat_validation')],
+                        fill=self._vat_warning_fill))
+        self._non_deductible_cf = (
+            self.config.get_conditional_formatting_range('non_deductible'),
+            FormulaRule(formula=[self.config.get_conditional_formatting_formula('non_deductible')],
+                        fill=self._non_deductible_fill))
+
+        # Validation-note cells are pure functions of the layout config,
+        # so their references are resolved once rather than per sheet
+        self._total_verify_cell = self.config.get_cell_reference(
+            self.config.header_start_row + 8,  # total_incl_vat row
+            self.config.header_value_column + 1)  # verification column
+        self._vat_note_cell = self.config.get_cell_reference(
+            self.config.header_start_row + 6,  # vat_amount row
+            self.config.header_value_column + 2)  # notes column
         
     def create_batch_workbook(self, receipts: List[Dict[str, Any]], images_dir: Path) -> Workbook:
         """Create workbook with multiple receipt worksheets"""
@@ -60,9 +119,10 @@ class ExcelGenerator:
         """Create a hidden sheet with categories and define a named range"""
         ws = wb.create_sheet(title="_Categories")
 
-        # Write categories to column A
-        for idx, category in enumerate(self.categories, 1):
-            ws.cell(row=idx, column=1, value=category)
+        # Write categories to column A - append is openpyxl's fast path
+        # (no coordinate bookkeeping per cell)
+        for category in self.categories:
+            ws.append([category])
 
         # Hide the sheet
         ws.sheet_state = 'hidden'
@@ -117,8 +177,8 @@ class ExcelGenerator:
             self.config.header_value_column + 2  # notes column
         )
         ws[notes_cell] = 'לבדיקה ידנית: ' + '; '.join(warnings)
-        ws[notes_cell].font = Font(bold=True, color=self.config.get_color('error'))
-        ws[notes_cell].alignment = Alignment(wrap_text=True, vertical='top')
+        ws[notes_cell].font = self._bold_error_font
+        ws[notes_cell].alignment = self._wrap_top
 
     def _add_header_section(self, ws: Worksheet, receipt: Dict[str, Any]):
         """Add header information section"""
@@ -127,20 +187,23 @@ class ExcelGenerator:
         titles = self.config.get_header_titles()
 
         for cell_ref, title in zip(title_cells, titles):
-            ws[cell_ref] = title
-            ws[cell_ref].font = Font(bold=True)
-            ws[cell_ref].fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+            cell = ws[cell_ref]
+            cell.value = title
+            cell.font = self._bold_font
+            cell.fill = self._title_fill
 
         # Add receipt info
         receipt_info = receipt.get('receipt_info', {})
         amounts = receipt.get('amounts', {})
         classification = receipt.get('classification', {})
 
+        # ws.cell(row=, column=) skips the coordinate-string parse that
+        # ws[f'B{row}'] style indexing does on every access
+        field_col = self.config.header_field_column
+        value_col = self.config.header_value_column
         row = self.config.header_start_row
         for hebrew_name, field_key in self.config.get_header_fields():
-            field_cell = self.config.get_cell_reference(row, self.config.header_field_column)
-            value_cell = self.config.get_cell_reference(row, self.config.header_value_column)
-            ws[field_cell] = hebrew_name
+            ws.cell(row=row, column=field_col, value=hebrew_name)
 
             # Get value based on field
             if field_key in receipt_info:
@@ -154,48 +217,47 @@ class ExcelGenerator:
 
             # Special handling for document type
             if field_key == 'document_type':
-                ws[value_cell] = self.config.get_document_type_mapping(value)
+                value_cell = ws.cell(row=row, column=value_col,
+                                     value=self.config.get_document_type_mapping(value))
                 # Add dropdown validation
                 document_types = self.config.get_document_types()
                 dv = DataValidation(type="list", formula1='"' + ','.join(document_types) + '"')
-                dv.add(ws[value_cell])
+                dv.add(value_cell)
                 ws.add_data_validation(dv)
             elif field_key == 'category':
-                ws[value_cell] = value
+                value_cell = ws.cell(row=row, column=value_col, value=value)
                 # Add category dropdown using named range (avoids 255 char limit)
                 if self.categories:
                     dv = DataValidation(type="list", formula1="=CategoryList")
-                    dv.add(ws[value_cell])
+                    dv.add(value_cell)
                     ws.add_data_validation(dv)
             elif field_key == 'original_file':
                 # Add hyperlink to original file with filename as display text
                 original_file_path = receipt_info.get('original_file', '')
                 if original_file_path:
                     filename = Path(original_file_path).name
-                    ws[value_cell] = filename
+                    value_cell = ws.cell(row=row, column=value_col, value=filename)
                     # Create proper file:// URL for absolute path
                     # Excel requires file:///C:/path format (three slashes, forward slashes)
                     resolved_path = Path(original_file_path).resolve().as_posix()
-                    file_url = f"file:///{resolved_path}"
-                    ws[value_cell].hyperlink = file_url
-                    ws[value_cell].font = Font(color=self.config.get_color('hyperlink'), underline="single")
+                    value_cell.hyperlink = f"file:///{resolved_path}"
+                    value_cell.font = self._hyperlink_font
                 else:
-                    ws[value_cell] = ''
+                    ws.cell(row=row, column=value_col, value='')
             elif field_key == 'reasoning':
                 # Make reasoning cell multiline with text wrapping
-                ws[value_cell] = value
-                ws[value_cell].alignment = Alignment(wrap_text=True, vertical='top')
+                value_cell = ws.cell(row=row, column=value_col, value=value)
+                value_cell.alignment = self._wrap_top
                 # Make the row taller for reasoning
                 ws.row_dimensions[row].height = self.config.config['formatting']['line_items_section']['reasoning_cell_height']
             else:
-                ws[value_cell] = value
+                ws.cell(row=row, column=value_col, value=value)
 
             # Add verification formula for total_incl_vat to check if it equals excl + vat
             if field_key == 'total_incl_vat':
-                verify_cell = self.config.get_cell_reference(row, self.config.header_value_column + 1)
-                excl_cell = self.config.get_cell_reference(row-2, self.config.header_value_column)
-                vat_cell = self.config.get_cell_reference(row-1, self.config.header_value_column)
-                ws[verify_cell] = f'={excl_cell}+{vat_cell}'
+                excl_cell = self.config.get_cell_reference(row-2, value_col)
+                vat_cell = self.config.get_cell_reference(row-1, value_col)
+                ws.cell(row=row, column=value_col + 1, value=f'={excl_cell}+{vat_cell}')
 
             row += 1
             
@@ -205,57 +267,64 @@ class ExcelGenerator:
         headers = self.config.get_line_item_headers()
 
         # Add headers
+        header_bold = self.config.config['formatting']['line_items_section']['header_bold']
         for col_idx, header in enumerate(headers, 1):
             cell = ws.cell(row=start_row, column=col_idx, value=header)
-            if self.config.config['formatting']['line_items_section']['header_bold']:
-                cell.font = Font(bold=True)
-            bg_color = self.config.config['formatting']['line_items_section']['header_background_color']
-            cell.fill = PatternFill(start_color=bg_color, end_color=bg_color, fill_type="solid")
+            if header_bold:
+                cell.font = self._bold_font
+            cell.fill = self._line_header_fill
             
+        # One shared validation for the whole deductible column - a fresh
+        # DataValidation per row serializes K identical rules into the sheet XML
+        boolean_options = self.config.get_boolean_validation_options()
+        show_dropdown = self.config.get_validation_show_dropdown()
+        deductible_dv = DataValidation(type="list", formula1=f'"{boolean_options}"',
+                                       showDropDown=show_dropdown)
+
+        # Loop invariants: column indices, the VAT% formula template and the
+        # non-deductible note are constant per sheet, so resolve them once
+        desc_col = self.config.get_line_item_column('description')
+        amount_col_idx = self.config.get_line_item_column('amount_excl_vat')
+        vat_col_idx = self.config.get_line_item_column('vat')
+        vat_pct_col = self.config.get_line_item_column('vat_percent')
+        total_col = self.config.get_line_item_column('total')
+        deductible_col = self.config.get_line_item_column('deductible')
+        notes_col = self.config.get_line_item_column('notes')
+        amount_col = get_column_letter(amount_col_idx)
+        vat_col = get_column_letter(vat_col_idx)
+        vat_pct_template = f'=IF({amount_col}{{r}}=0,0,{vat_col}{{r}}/{amount_col}{{r}}*100)'
+        non_deductible_note = self.config.get_text_message('non_deductible_note')
+
         # Add line items
         data_start_row = self.config.line_items_start_row
         for idx, item in enumerate(line_items):
             row = data_start_row + idx
 
-            ws.cell(row=row, column=self.config.get_line_item_column('description'),
-                   value=item.get('description', ''))
-            ws.cell(row=row, column=self.config.get_line_item_column('amount_excl_vat'),
-                   value=item.get('amount_excl_vat', 0))
-            ws.cell(row=row, column=self.config.get_line_item_column('vat'),
-                   value=item.get('vat', 0))
+            ws.cell(row=row, column=desc_col, value=item.get('description', ''))
+            ws.cell(row=row, column=amount_col_idx, value=item.get('amount_excl_vat', 0))
+            ws.cell(row=row, column=vat_col_idx, value=item.get('vat', 0))
 
             # VAT percentage formula using config
-            amount_col = get_column_letter(self.config.get_line_item_column('amount_excl_vat'))
-            vat_col = get_column_letter(self.config.get_line_item_column('vat'))
-            ws.cell(row=row, column=self.config.get_line_item_column('vat_percent'),
-                   value=f'=IF({amount_col}{row}=0,0,{vat_col}{row}/{amount_col}{row}*100)')
+            ws.cell(row=row, column=vat_pct_col, value=vat_pct_template.format(r=row))
 
-            ws.cell(row=row, column=self.config.get_line_item_column('total'),
-                   value=item.get('total', 0))
+            ws.cell(row=row, column=total_col, value=item.get('total', 0))
 
             # Deductible checkbox
-            deductible_cell = ws.cell(row=row, column=self.config.get_line_item_column('deductible'),
-                                    value=item.get('deductible', True))
-
-            # Add checkbox-style data validation
-            boolean_options = self.config.get_boolean_validation_options()
-            show_dropdown = self.config.get_validation_show_dropdown()
-            dv = DataValidation(type="list", formula1=f'"{boolean_options}"', showDropDown=show_dropdown)
-            dv.add(deductible_cell)
-            ws.add_data_validation(dv)
+            deductible = item.get('deductible', True)
+            deductible_cell = ws.cell(row=row, column=deductible_col, value=deductible)
+            deductible_dv.add(deductible_cell)
 
             # Notes column - add note for non-deductible items
-            if not item.get('deductible', True):
-                note_text = self.config.get_text_message('non_deductible_note')
-                notes_cell = ws.cell(row=row, column=self.config.get_line_item_column('notes'),
-                                   value=note_text)
-                notes_cell.alignment = Alignment(wrap_text=True, vertical='top')
+            if not deductible:
+                notes_cell = ws.cell(row=row, column=notes_col, value=non_deductible_note)
+                notes_cell.alignment = self._wrap_top
             else:
-                ws.cell(row=row, column=self.config.get_line_item_column('notes'), value='')
+                ws.cell(row=row, column=notes_col, value='')
 
         # Totals row: sum the line items and warn when they don't add up
         # to the receipt total (catches items the extraction missed)
         if line_items:
+            ws.add_data_validation(deductible_dv)
             self._add_line_items_sum_row(ws, len(line_items))
 
     def _add_line_items_sum_row(self, ws: Worksheet, item_count: int):
@@ -266,13 +335,13 @@ class ExcelGenerator:
 
         desc_cell = ws.cell(row=sum_row, column=self.config.get_line_item_column('description'),
                             value=self.config.line_items_sum_label)
-        desc_cell.font = Font(bold=True)
+        desc_cell.font = self._bold_font
 
         for field in ('amount_excl_vat', 'vat', 'total'):
             col = get_column_letter(self.config.get_line_item_column(field))
             cell = ws.cell(row=sum_row, column=self.config.get_line_item_column(field),
                            value=f'=SUM({col}{first_row}:{col}{last_row})')
-            cell.font = Font(bold=True)
+            cell.font = self._bold_font
 
         # Compare item totals to the header total (incl. VAT)
         total_col = get_column_letter(self.config.get_line_item_column('total'))
@@ -281,7 +350,7 @@ class ExcelGenerator:
             row=sum_row, column=self.config.get_line_item_column('notes'),
             value=f'=IF(ABS({total_col}{sum_row}-{header_total})>0.02,'
                   f'"הפריטים אינם מסתכמים לסה\"\"כ ("&ROUND({total_col}{sum_row}-{header_total},2)&")","")')
-        check_cell.font = Font(bold=True, color=self.config.get_color('error'))
+        check_cell.font = self._bold_error_font
 
     def _add_receipt_image(self, ws: Worksheet, receipt: Dict[str, Any], images_dir: Path):
         """Add receipt image to worksheet"""
@@ -321,22 +390,10 @@ class ExcelGenerator:
         """Add conditional formatting and validation"""
 
         # Add conditional formatting for VAT validation using config
-        vat_range = self.config.get_conditional_formatting_range('vat_validation')
-        vat_formula = self.config.get_conditional_formatting_formula('vat_validation')
-        vat_yellow_fill = PatternFill(start_color=self.config.get_color('vat_validation'),
-                                     end_color=self.config.get_color('vat_validation'),
-                                     fill_type="solid")
-        vat_rule = FormulaRule(formula=[vat_formula], fill=vat_yellow_fill)
-        ws.conditional_formatting.add(vat_range, vat_rule)
+        ws.conditional_formatting.add(*self._vat_validation_cf)
 
         # Red fill for non-deductible items using config
-        non_deductible_range = self.config.get_conditional_formatting_range('non_deductible')
-        non_deductible_formula = self.config.get_conditional_formatting_formula('non_deductible')
-        non_deductible_fill = PatternFill(start_color=self.config.get_color('non_deductible'),
-                                        end_color=self.config.get_color('non_deductible'),
-                                        fill_type="solid")
-        non_deductible_rule = FormulaRule(formula=[non_deductible_formula], fill=non_deductible_fill)
-        ws.conditional_formatting.add(non_deductible_range, non_deductible_rule)
+        ws.conditional_formatting.add(*self._non_deductible_cf)
 
         # Add notes for validation errors using config for cell references
         amounts = receipt.get('amounts', {})
@@ -344,50 +401,36 @@ class ExcelGenerator:
         vat = amounts.get('vat_amount', 0)
         total_incl = amounts.get('total_incl_vat', 0)
 
-        # Get cell references for validation checks
-        total_incl_cell = self.config.get_header_cell_reference('total_incl_vat')
-        verify_cell = self.config.get_cell_reference(
-            self.config.header_start_row + 8,  # total_incl_vat row
-            self.config.header_value_column + 1  # verification column
-        )
-
         # Check total validation
         if abs((total_excl + vat) - total_incl) > 0.01:
-            error_msg = self.config.get_text_message('total_mismatch_error')
-            ws[verify_cell] = error_msg
-            ws[verify_cell].font = Font(color=self.config.get_color('error'))
+            verify_cell = ws[self._total_verify_cell]
+            verify_cell.value = self.config.get_text_message('total_mismatch_error')
+            verify_cell.font = self._error_font
 
         # Check VAT percentage and add warning to VAT amount cell
         if total_excl > 0:
             vat_pct = (vat / total_excl) * 100
             if abs(vat_pct) > 0.1 and abs(vat_pct - 18) > 0.1:
-                vat_note_cell = self.config.get_cell_reference(
-                    self.config.header_start_row + 6,  # vat_amount row
-                    self.config.header_value_column + 2  # notes column
-                )
-                warning_msg = self.config.get_text_message('vat_warning_format', vat_pct=vat_pct)
-                ws[vat_note_cell] = warning_msg
-                ws[vat_note_cell].font = Font(color=self.config.get_color('warning'))
+                vat_note_cell = ws[self._vat_note_cell]
+                vat_note_cell.value = self.config.get_text_message(
+                    'vat_warning_format', vat_pct=vat_pct)
+                vat_note_cell.font = self._warning_font
                 
         
     def _load_categories(self) -> List[str]:
         """Load categories from icount-categories.md file"""
         categories = []
-        
+
         try:
-            with open(self.categories_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # Extract category names from first column of tables (more restrictive pattern)
-            # Matches: | **category_name** | at the start of a line
-            pattern = r'^\|\s*\*\*([^*]+)\*\*\s*\|'
-            matches = re.findall(pattern, content, re.MULTILINE)
-            
+            matches = _read_category_matches(
+                str(self.categories_file_path),
+                self.categories_file_path.stat().st_mtime_ns)
+
             # Filter out table headers
             skip_items = self.config.get_category_skip_items()
-            categories = [m.strip() for m in matches if m.strip() not in skip_items]
-            
+            categories = [m for m in matches if m not in skip_items]
+
         except Exception as e:
             logger.error(f"Error loading categories from {self.categories_file_path}: {e}")
-            
+
         return categories
\ No newline at end of file
@@ -4,14 +4,46 @@
 
 import json
 import logging
+import os
 import yaml
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Optional, Any
 
+# libyaml's C emitter when the wheel ships it; output is identical, the
+# Python-level node walking is what it saves. YAML stays the log format -
+# the audit tooling and humans read these files.
+try:
+    from yaml import CDumper as _Dumper
+except ImportError:
+    from yaml import Dumper as _Dumper
+
 logger = logging.getLogger(__name__)
 
 
+def _atomic_write_text(path: Path, text: str) -> None:
+    """Write text to path via a .tmp sibling and os.replace.
+
+    A crash mid-write leaves at worst a stale .tmp file, never a truncated
+    log that downstream consumers would fail to parse.
+    """
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    tmp.write_text(text, encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def _str_representer(dumper, data):
+    """Force pipe notation for prompt_used field and any multiline strings"""
+    if '\n' in data or len(data) > 80:
+        return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
+    return dumper.represent_scalar('tag:yaml.org,2002:str', data)
+
+
+# Registered once at import - re-registering per log call only redid the same
+# global mutation for every receipt
+yaml.add_representer(str, _str_representer, Dumper=_Dumper)
+
+
 class ReceiptLogger:
     """Handles logging of LLM interactions and processing statistics"""
     
@@ -29,8 +61,8 @@ class ReceiptLogger:
         response_format: dict = None
     ):
         """Log complete LLM request/response/error to YAML file with pipe notation"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-        filename = f"llm_call_{Path(receipt_file).stem}_{timestamp}.yaml"
+        now = datetime.now()
+        filename = f"llm_call_{Path(receipt_file).stem}_{now.strftime('%Y%m%d_%H%M%S_%f')}.yaml"
         log_path = self.log_dir / filename
         
         # Extract metadata from response if available
@@ -45,7 +77,7 @@ class ReceiptLogger:
         
         # Prepare log entry with multiline strings using pipe notation
         log_entry = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'receipt_file': receipt_file,
             'request': request_data,
             'api_metadata': api_metadata,
@@ -56,19 +88,10 @@ class ReceiptLogger:
             'success': error is None and response_data is not None
         }
         
-        # Custom representer for multiline strings to use pipe notation
-        def str_representer(dumper, data):
-            # Force pipe notation for prompt_used field and any multiline strings
-            if '\n' in data or len(data) > 80:
-                return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
-            return dumper.represent_scalar('tag:yaml.org,2002:str', data)
-        
-        yaml.add_representer(str, str_representer)
-        
-        with open(log_path, 'w', encoding='utf-8') as f:
-            yaml.dump(log_entry, f, default_flow_style=False, allow_unicode=True, 
-                     sort_keys=False, indent=2)
-            
+        _atomic_write_text(log_path, yaml.dump(
+            log_entry, Dumper=_Dumper, default_flow_style=False,
+            allow_unicode=True, sort_keys=False, indent=2))
+
         logger.info(f"Logged LLM interaction to {log_path}")
         
     def log_processing_stats(self, stats: Dict[str, Any]):
@@ -77,17 +100,8 @@ class ReceiptLogger:
         filename = f"processing_summary_{timestamp}.yaml"
         log_path = self.log_dir.parent / filename
         
-        # Custom representer for multiline strings to use pipe notation
-        def str_representer(dumper, data):
-            # Force pipe notation for prompt_used field and any multiline strings
-            if '\n' in data or len(data) > 80:
-                return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
-            return dumper.represent_scalar('tag:yaml.org,2002:str', data)
-        
-        yaml.add_representer(str, str_representer)
-        
-        with open(log_path, 'w', encoding='utf-8') as f:
-            yaml.dump(stats, f, default_flow_style=False, allow_unicode=True, 
-                     sort_keys=False, indent=2)
-            
+        _atomic_write_text(log_path, yaml.dump(
+            stats, Dumper=_Dumper, default_flow_style=False,
+            allow_unicode=True, sort_keys=False, indent=2))
+
         logger.info(f"Logged processing stats to {log_path}")
\ No newline at end of file
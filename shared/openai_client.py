@@ -2,21 +2,40 @@
 # Licensed under AGPL-3.0-or-later - see LICENSE file for details
 """OpenAI API client with structured output support"""
 
+import asyncio
 import base64
+import hashlib
 import io
 import json
 import logging
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
-from openai import AsyncOpenAI
+from openai import (AsyncOpenAI, APIConnectionError, APITimeoutError,
+                    InternalServerError, RateLimitError)
 import aiofiles
 from jinja2 import Environment, FileSystemLoader
 
+from .image_handler import ImageHandler
+
 logger = logging.getLogger(__name__)
 
+# Suffix -> MIME type for API payloads; unknown suffixes fall back to JPEG
+MIME_TYPES = {
+    '.pdf': 'application/pdf',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+
 
-@dataclass
+@dataclass(slots=True)
 class ReceiptInfo:
     number: str
     vendor: str
@@ -27,13 +46,13 @@ class ReceiptInfo:
     reasoning: str
     currency: str
 
-@dataclass
+@dataclass(slots=True)
 class AmountData:
     total_excl_vat: float
     vat_amount: float
     total_incl_vat: float
 
-@dataclass
+@dataclass(slots=True)
 class LineItem:
     description: str
     amount_excl_vat: float
@@ -41,13 +60,13 @@ class LineItem:
     total: float
     deductible: bool = True
 
-@dataclass
+@dataclass(slots=True)
 class Classification:
     category: str
     confidence: float
     document_type_mapping: str  # For iCount export
 
-@dataclass 
+@dataclass(slots=True)
 class ProcessedReceipt:
     file_path: Path
     receipt_info: ReceiptInfo
@@ -66,6 +85,32 @@ MODEL_PRICING = {
 }
 
 
+@lru_cache(maxsize=None)
+def _load_prompt_assets(prompts_dir: str) -> tuple:
+    """Jinja environment, template and output schema for prompts_dir.
+
+    Cached so every client instance in a run shares one parsed template and
+    schema; auto_reload=False stops Jinja statting the template file on
+    every render.
+    """
+    env = Environment(loader=FileSystemLoader(prompts_dir), auto_reload=False)
+    template = env.get_template('receipt_extraction_prompt.j2')
+    with open(Path(prompts_dir) / 'receipt_extraction_schema.json', 'r', encoding='utf-8') as f:
+        schema = json.load(f)
+    return env, template, schema
+
+
+def _data_url(mime_type: str, payload: bytes) -> str:
+    """Base64 data URL for payload, built in a single pass.
+
+    Concatenating at the bytes level costs one C-level b64encode plus one
+    ascii decode; an f-string over an already-decoded base64 str would copy
+    the multi-MB payload a second time.
+    """
+    prefix = f"data:{mime_type};base64,".encode('ascii')
+    return (prefix + base64.b64encode(payload)).decode('ascii')
+
+
 def estimate_cost_usd(model: str, usage: Dict[str, int]) -> Optional[float]:
     """Estimate call cost in USD from token usage; None if model pricing unknown"""
     pricing = MODEL_PRICING.get(model)
@@ -78,23 +123,101 @@ def estimate_cost_usd(model: str, usage: Dict[str, int]) -> Optional[float]:
             + usage.get('output_tokens', 0) * output_price) / 1_000_000
 
 
+class ResponseCache:
+    """On-disk content-addressable cache of raw model responses.
+
+    The key hashes everything that determines the model's output - model name,
+    payload digest, rendered prompt and output schema - so re-running an
+    already-processed receipt skips the API call. Entries are JSON files under
+    a two-hex-char fan-out; writes go through a .tmp sibling and os.replace so
+    concurrent workers can safely share one cache directory.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(model: str, source_sha256: str, prompt: str, schema_sha256: str) -> str:
+        h = hashlib.sha256()
+        for part in (model, source_sha256, schema_sha256):
+            h.update(part.encode('utf-8'))
+            h.update(b'\x00')
+        h.update(prompt.encode('utf-8'))
+        return h.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.json'
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached output_text for key, or None"""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)['output_text']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # A corrupt entry just means a cache miss, never a failed receipt
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+
+    def put(self, key: str, output_text: str, model: str) -> None:
+        try:
+            path = self._entry_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            entry = {'output_text': output_text, 'model': model,
+                     'cached_at': datetime.now().isoformat()}
+            # Per-process tmp name: two runs sharing a cache dir may write the
+            # same key concurrently, and a shared tmp would let one replace()
+            # pull the file out from under the other
+            tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+            tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp, path)
+        except OSError as e:
+            # The receipt already succeeded; losing the cache entry only
+            # costs a re-extraction on the next run
+            logger.warning(f"Could not write cache entry for {key}: {e}")
+
+
 class OpenAIClient:
     """Client for OpenAI API with structured output"""
 
-    def __init__(self, api_key: str, model: str):
-        """Initialize OpenAI client with Jinja template environment"""
+    def __init__(self, api_key: str, model: str, cache_dir: Optional[Path] = None,
+                 capture_prompt: bool = True):
+        """Initialize OpenAI client with Jinja template environment
+
+        cache_dir enables the on-disk response cache (None = every call
+        goes to the API). capture_prompt controls whether results carry the
+        full rendered prompt for logging; disabling it saves tens of KB of
+        retained strings per receipt when verbose logs aren't needed.
+        """
         self.client = AsyncOpenAI(api_key=api_key)
         self.model = model
         
-        # Setup Jinja2 template environment and schema
+        # Setup Jinja2 template environment and schema (shared across instances)
         prompts_dir = Path(__file__).parent.parent / 'prompts'
-        self.jinja_env = Environment(loader=FileSystemLoader(prompts_dir))
-        self.prompt_template = self.jinja_env.get_template('receipt_extraction_prompt.j2')
-        
-        # Load JSON schema from file
-        schema_path = prompts_dir / 'receipt_extraction_schema.json'
-        with open(schema_path, 'r', encoding='utf-8') as f:
-            self.text_format = json.load(f)
+        self.jinja_env, self.prompt_template, self.text_format = \
+            _load_prompt_assets(str(prompts_dir))
+
+        # Resolved once - every call's api_metadata repeats this value
+        self._text_format_type = self.text_format.get('type', 'unknown')
+
+        # Constant request parts, hoisted so each call reuses them instead of
+        # rebuilding identical objects
+        self._instructions = ("You are a receipt data extraction expert. "
+                              "Extract data accurately from receipts and classify "
+                              "expenses for Israeli tax reporting.")
+        self._text_param = {"format": self.text_format}
+
+        self.capture_prompt = capture_prompt
+        self._response_cache = ResponseCache(cache_dir) if cache_dir else None
+        # Rendered prompts keyed by (dir, file mtimes) - static across a batch
+        # run, so one render serves every receipt
+        self._prompt_cache: Dict[tuple, str] = {}
+        # Schema digest for cache keys, computed once - the schema is static per run
+        self._schema_sha256 = hashlib.sha256(
+            json.dumps(self.text_format, sort_keys=True).encode('utf-8')).hexdigest()
         
     async def extract_receipt_data(
         self,
@@ -110,15 +233,16 @@ class OpenAIClient:
         sent - raw PDF as input_file, or the image as input_image.
         """
 
-        # Record request timing
-        from datetime import datetime
+        # Record request timing; durations come from the monotonic clock so a
+        # wall-clock adjustment mid-call can't skew them
         request_start_time = datetime.now()
+        t_request_start = time.perf_counter()
 
         # Read and encode file (image or PDF), unless an override image was provided
         if image is None:
-            file_data, mime_type = await self._encode_file(file_path)
+            data_url, mime_type, source_sha256 = await self._encode_file(file_path)
         else:
-            file_data, mime_type = None, None
+            data_url, mime_type, source_sha256 = None, None, None
 
         # Build the prompt using Jinja template with all extraction prompt content
         prompt = await self._build_extraction_prompt(extraction_prompt_dir)
@@ -132,49 +256,115 @@ class OpenAIClient:
                 # Override bitmap (raster-only PDF): send as an image
                 buf = io.BytesIO()
                 image.save(buf, 'PNG')
-                img_b64 = base64.b64encode(buf.getvalue()).decode('utf-8')
+                # getbuffer() hands hashlib/base64 a view of the encoder's own
+                # buffer instead of copying multi-MB PNG bytes out first
+                png_view = buf.getbuffer()
+                source_sha256 = hashlib.sha256(png_view).hexdigest()
+                image_url = _data_url('image/png', png_view)
+                del png_view  # release the view so the buffer can be freed
                 file_content = {
                     "type": "input_image",
-                    "image_url": f"data:image/png;base64,{img_b64}"
+                    "image_url": image_url
                 }
             elif mime_type == 'application/pdf':
                 file_content = {
                     "type": "input_file",
                     "filename": file_path.name,
-                    "file_data": f"data:{mime_type};base64,{file_data}"
+                    "file_data": data_url
                 }
             else:
                 # For images, use input_image type
                 file_content = {
                     "type": "input_image",
-                    "image_url": f"data:{mime_type};base64,{file_data}"
+                    "image_url": data_url
                 }
             
-            # API parameters for logging
-            api_params = {
-                'model': self.model,
-                'store': False,
-                'text_format': text_format
-            }
+            # Cache lookup: same payload + prompt + schema + model means the
+            # stored response is as good as a fresh call
+            cache_key = None
+            if self._response_cache is not None:
+                cache_key = ResponseCache.make_key(
+                    self.model, source_sha256, prompt, self._schema_sha256)
+                cached_text = self._response_cache.get(cache_key)
+                if cached_text is not None:
+                    logger.info(f"Response cache hit for {file_path.name}")
+                    result = json.loads(cached_text)
+                    result['receipt_info']['original_file'] = str(file_path)
+                    if self.capture_prompt:
+                        result['prompt_used'] = prompt
+                        result['response_format_used'] = text_format
+                    result['api_metadata'] = {
+                        'model': self.model,
+                        'request_timestamp': request_start_time.isoformat(),
+                        'cache_hit': True,
+                        'store': False,
+                        'text_format_type': self._text_format_type,
+                        'source_sha256': source_sha256,
+                        'usage': None
+                    }
+                    return result
+
             
-            # Make API call using Responses API with structured output
+            # Make API call using Responses API with structured output.
+            # Transient API errors back off and retry; a malformed response
+            # retries with the parse error fed back so the model can correct
+            # itself instead of failing the receipt outright.
+            input_messages = [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "input_text", "text": prompt},
+                        file_content
+                    ]
+                }
+            ]
+            max_attempts = 3
+            retry_count = 0
             api_call_start = datetime.now()
-            response = await self.client.responses.create(
-                model=self.model,
-                instructions="You are a receipt data extraction expert. Extract data accurately from receipts and classify expenses for Israeli tax reporting.",
-                input=[
-                    {
+            t_api_start = time.perf_counter()
+            for attempt in range(max_attempts):
+                try:
+                    response = await self.client.responses.create(
+                        model=self.model,
+                        instructions=self._instructions,
+                        input=input_messages,
+                        text=self._text_param,
+                        store=False  # Don't store for compliance
+                    )
+                except (RateLimitError, APITimeoutError, APIConnectionError,
+                        InternalServerError) as e:
+                    if attempt == max_attempts - 1:
+                        raise
+                    retry_count += 1
+                    delay = 1.0 * (attempt + 1)
+                    logger.warning(f"Transient API error for {file_path.name} "
+                                   f"(attempt {attempt + 1}/{max_attempts}): {e}; "
+                                   f"retrying in {delay:.0f}s")
+                    await asyncio.sleep(delay)
+                    continue
+
+                # Parse the structured response from output_text
+                try:
+                    result = json.loads(response.output_text)
+                    break
+                except json.JSONDecodeError as e:
+                    if attempt == max_attempts - 1:
+                        raise
+                    retry_count += 1
+                    logger.warning(f"Unparseable response for {file_path.name} "
+                                   f"(attempt {attempt + 1}/{max_attempts}): {e}; "
+                                   f"retrying with feedback")
+                    input_messages = input_messages + [{
                         "role": "user",
-                        "content": [
-                            {"type": "input_text", "text": prompt},
-                            file_content
-                        ]
-                    }
-                ],
-                text={"format": text_format},
-                store=False  # Don't store for compliance
-            )
+                        "content": [{
+                            "type": "input_text",
+                            "text": (f"Your previous response could not be parsed as "
+                                     f"JSON ({e}). It began: {response.output_text[:500]!r}. "
+                                     f"Return only valid JSON matching the required schema.")
+                        }]
+                    }]
             api_call_end = datetime.now()
+            t_api_end = time.perf_counter()
 
             # Capture token usage for cost tracking
             usage = getattr(response, 'usage', None)
@@ -190,24 +380,28 @@ class OpenAIClient:
                     'total_tokens': usage.total_tokens,
                 }
 
-            # Parse the structured response from output_text
-            result = json.loads(response.output_text)
-            
+            if cache_key is not None:
+                self._response_cache.put(cache_key, response.output_text, self.model)
+
             # Add the original file path
             result['receipt_info']['original_file'] = str(file_path)
             
             # Add metadata for logging (without underscore prefix)
-            result['prompt_used'] = prompt
-            result['response_format_used'] = text_format
+            if self.capture_prompt:
+                result['prompt_used'] = prompt
+                result['response_format_used'] = text_format
             result['api_metadata'] = {
                 'model': self.model,
                 'request_timestamp': request_start_time.isoformat(),
                 'api_call_start': api_call_start.isoformat(),
                 'api_call_end': api_call_end.isoformat(),
-                'total_response_time_seconds': (api_call_end - request_start_time).total_seconds(),
-                'api_response_time_seconds': (api_call_end - api_call_start).total_seconds(),
+                'total_response_time_seconds': t_api_end - t_request_start,
+                'api_response_time_seconds': t_api_end - t_api_start,
                 'store': False,
-                'text_format_type': text_format.get('type', 'unknown'),
+                'cache_hit': False,
+                'retry_count': retry_count,
+                'text_format_type': self._text_format_type,
+                'source_sha256': source_sha256,
                 'usage': usage_data
             }
 
@@ -217,28 +411,29 @@ class OpenAIClient:
             logger.error(f"Error extracting receipt data: {e}")
             raise
             
-    async def _encode_file(self, file_path: Path) -> tuple[str, str]:
-        """Encode file to base64 and determine MIME type"""
+    async def _encode_file(self, file_path: Path) -> tuple[str, str, str]:
+        """Build a base64 data URL with MIME type and SHA-256 of the sent bytes.
+
+        The file is read once; the digest is computed on the same buffer that
+        gets base64-encoded, so the payload is never re-read or re-hashed.
+        """
+        # Determine MIME type based on file extension
+        mime_type = MIME_TYPES.get(file_path.suffix.lower(), 'image/jpeg')
+
+        # Oversized source images are downscaled before upload - the model tiles
+        # them down anyway, so full resolution is pure payload cost. The PIL
+        # decode/re-encode blocks, so it runs off the event loop.
+        if mime_type != 'application/pdf':
+            downscaled = await asyncio.to_thread(ImageHandler.downscale_for_api, file_path)
+            if downscaled is not None:
+                return (_data_url('image/jpeg', downscaled), 'image/jpeg',
+                        hashlib.sha256(downscaled).hexdigest())
+
         async with aiofiles.open(file_path, 'rb') as f:
             file_data = await f.read()
-            base64_data = base64.b64encode(file_data).decode('utf-8')
-            
-        # Determine MIME type based on file extension
-        suffix = file_path.suffix.lower()
-        if suffix == '.pdf':
-            mime_type = 'application/pdf'
-        elif suffix in ['.jpg', '.jpeg']:
-            mime_type = 'image/jpeg'
-        elif suffix == '.png':
-            mime_type = 'image/png'
-        elif suffix == '.gif':
-            mime_type = 'image/gif'
-        elif suffix == '.webp':
-            mime_type = 'image/webp'
-        else:
-            mime_type = 'image/jpeg'  # Default fallback
-            
-        return base64_data, mime_type
+
+        return (_data_url(mime_type, file_data), mime_type,
+                hashlib.sha256(file_data).hexdigest())
             
     async def _build_extraction_prompt(self, extraction_prompt_dir: Path) -> str:
         """Build the extraction prompt using Jinja template with all content from extraction-prompt directory"""
@@ -246,13 +441,23 @@ class OpenAIClient:
         # Load all markdown files from extraction-prompt directory in order
         # Skip README.md file
         prompt_files = sorted([f for f in extraction_prompt_dir.glob("*.md") if f.name != "README.md"])
-        
-        combined_content = []
-        for file_path in prompt_files:
-            async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-                content = await f.read()
-                combined_content.append(content)
-        
+
+        # The rendered prompt only depends on these files; reuse it until one
+        # of them changes on disk
+        cache_key = (str(extraction_prompt_dir),
+                     tuple((f.name, f.stat().st_mtime_ns) for f in prompt_files))
+        cached = self._prompt_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Read the files concurrently - a cache miss then costs one round of
+        # I/O latency instead of one per file
+        async def _read(path: Path) -> str:
+            async with aiofiles.open(path, 'r', encoding='utf-8') as f:
+                return await f.read()
+
+        combined_content = await asyncio.gather(*(_read(f) for f in prompt_files))
+
         # Join all content with double newlines
         full_content = "\n\n".join(combined_content)
         
@@ -261,5 +466,6 @@ class OpenAIClient:
             categories_content=full_content,
             personal_instructions="",  # Now included in categories_content
         )
-        
+
+        self._prompt_cache[cache_key] = prompt
         return prompt
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""Tests for the extractor's worker pool (_process_receipts_parallel):
+result ordering, per-receipt error capture, and the concurrency cap.
+"""
+import asyncio
+from pathlib import Path
+
+from receipt_extractor import ReceiptExtractor
+
+
+def make_extractor(max_concurrent, process):
+    ex = object.__new__(ReceiptExtractor)  # bypass __init__ (needs API key)
+    ex.max_concurrent = max_concurrent
+    ex._process_single_receipt = process
+    return ex
+
+
+def test_results_keep_input_order():
+    async def process(path):
+        # later files finish first - ordering must come from the queue index
+        await asyncio.sleep(0.02 if "a" in path.name else 0)
+        return {"status": "success", "file_path": str(path)}
+
+    files = [Path(f"{n}.jpg") for n in ("a1", "b2", "a3", "b4")]
+    ex = make_extractor(3, process)
+    results = asyncio.run(ex._process_receipts_parallel(files))
+    assert [r["file_path"] for r in results] == [str(f) for f in files]
+
+
+def test_worker_error_becomes_error_result():
+    async def process(path):
+        if path.name == "bad.jpg":
+            raise RuntimeError("boom")
+        return {"status": "success", "file_path": str(path)}
+
+    files = [Path("ok1.jpg"), Path("bad.jpg"), Path("ok2.jpg")]
+    results = asyncio.run(make_extractor(2, process)._process_receipts_parallel(files))
+    assert [r["status"] for r in results] == ["success", "error", "success"]
+    assert results[1] == {"status": "error", "file_path": "bad.jpg", "error": "boom"}
+
+
+def test_concurrency_never_exceeds_cap():
+    in_flight = 0
+    peak = 0
+
+    async def process(path):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.005)
+        in_flight -= 1
+        return {"status": "success", "file_path": str(path)}
+
+    files = [Path(f"r{i}.jpg") for i in range(10)]
+    asyncio.run(make_extractor(3, process)._process_receipts_parallel(files))
+    assert peak <= 3
@@ -1,4 +1,5 @@
-"""Tests for the raster-only-PDF gate (extraction_bitmap) in ImageHandler.
+"""Tests for ImageHandler: the raster-only-PDF gate (extraction_bitmap) and
+the untouched-JPEG fast path in _process_image / save_image_for_excel.
 
 A portable fixture stands in for Weezmo receipts: PIL saves an image-only PDF, so
 it has no text layer and one embedded raster - the exact shape the gate targets.
@@ -70,3 +71,35 @@ def test_largest_embedded_image_prefers_content_over_blank(tmp_path):
     assert got is not None
     # the content page (more ink -> larger PNG) should be chosen, not the blank one
     assert got.size == (800, 1120)
+
+
+def test_small_jpeg_is_copied_verbatim(tmp_path):
+    src = tmp_path / "receipt.jpg"
+    Image.new("RGB", (300, 200), "white").save(src, "JPEG")
+    img = ImageHandler._process_image(src)
+    assert img.info.get("untouched_jpeg")
+    out = ImageHandler.save_image_for_excel(img, tmp_path / "out.jpg")
+    assert out.read_bytes() == src.read_bytes()
+
+
+def test_oversized_jpeg_is_not_copied(tmp_path):
+    # 3136 = 2 * 1568: draft() alone lands exactly on the cap, so the flag
+    # must be judged on the source size or this slips through at full size
+    src = tmp_path / "big.jpg"
+    Image.new("RGB", (3136, 3136), "white").save(src, "JPEG")
+    img = ImageHandler._process_image(src)
+    assert not img.info.get("untouched_jpeg")
+    out = ImageHandler.save_image_for_excel(img, tmp_path / "out.jpg")
+    with Image.open(out) as saved:
+        assert max(saved.size) <= ImageHandler.MAX_IMAGE_SIZE[0]
+
+
+def test_small_png_is_reencoded(tmp_path):
+    src = tmp_path / "receipt.png"
+    Image.new("RGB", (300, 200), "white").save(src, "PNG")
+    img = ImageHandler._process_image(src)
+    assert not img.info.get("untouched_jpeg")
+    out = ImageHandler.save_image_for_excel(img, tmp_path / "out.png")
+    assert out.suffix == ".jpg"
+    with Image.open(out) as saved:
+        assert saved.format == "JPEG"
@@ -0,0 +1,137 @@
+"""Tests for the offline parts of OpenAIClient: the on-disk response cache
+and the retry loop around responses.create (mocked API, no network).
+"""
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from shared.openai_client import OpenAIClient, ResponseCache
+
+
+# --- ResponseCache ---
+
+def test_cache_roundtrip_and_miss(tmp_path):
+    cache = ResponseCache(tmp_path)
+    key = ResponseCache.make_key("gpt-5-mini", "a" * 64, "prompt", "b" * 64)
+    assert cache.get(key) is None
+    cache.put(key, '{"ok": true}', "gpt-5-mini")
+    assert cache.get(key) == '{"ok": true}'
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = ResponseCache(tmp_path)
+    key = ResponseCache.make_key("gpt-5-mini", "a" * 64, "prompt", "b" * 64)
+    cache.put(key, "text", "gpt-5-mini")
+    path = cache._entry_path(key)
+    path.write_text("not json at all", encoding="utf-8")
+    assert cache.get(key) is None
+
+
+def test_key_depends_on_every_input():
+    base = ("gpt-5-mini", "a" * 64, "prompt", "b" * 64)
+    key = ResponseCache.make_key(*base)
+    for i in range(4):
+        changed = list(base)
+        changed[i] += "x"
+        assert ResponseCache.make_key(*changed) != key
+    # the NUL separators mean shifting chars between fields can't collide
+    assert ResponseCache.make_key("gpt-5", "minia" + "a" * 59, *base[2:]) != key
+
+
+def test_failed_write_never_raises(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path)
+    key = ResponseCache.make_key("gpt-5-mini", "a" * 64, "prompt", "b" * 64)
+    monkeypatch.setattr("shared.openai_client.os.replace",
+                        lambda *a: (_ for _ in ()).throw(OSError("disk full")))
+    cache.put(key, "text", "gpt-5-mini")  # must not propagate
+    assert cache.get(key) is None
+
+
+# --- retry loop ---
+
+def make_client(tmp_path, outputs):
+    """An OpenAIClient whose responses.create pops canned outputs.
+
+    Each element of outputs is either an output_text string or an exception
+    to raise. The returned calls list records the input message count per call.
+    """
+    client = OpenAIClient(api_key="test-key", model="gpt-5-mini")
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(len(kwargs["input"]))
+        item = outputs.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return SimpleNamespace(output_text=item, usage=None)
+
+    client.client = SimpleNamespace(responses=SimpleNamespace(create=create))
+    return client, calls
+
+
+@pytest.fixture
+def receipt_jpg(tmp_path):
+    jpg = tmp_path / "receipt.jpg"
+    Image.new("RGB", (300, 200), "white").save(jpg, "JPEG")
+    return jpg
+
+
+@pytest.fixture
+def prompt_dir(tmp_path):
+    d = tmp_path / "extraction-prompt"
+    d.mkdir()
+    (d / "001-categories.md").write_text("category rules", encoding="utf-8")
+    return d
+
+
+VALID = json.dumps({"receipt_info": {"vendor": "ספק"}})
+
+
+def test_unparseable_response_retries_with_feedback(tmp_path, receipt_jpg, prompt_dir):
+    client, calls = make_client(tmp_path, ["{broken", VALID])
+    result = asyncio.run(client.extract_receipt_data(receipt_jpg, prompt_dir))
+    assert result["receipt_info"]["vendor"] == "ספק"
+    assert result["api_metadata"]["retry_count"] == 1
+    # the retry carried the original message plus the parse-error feedback
+    assert calls == [1, 2]
+
+
+def test_transient_error_retries(tmp_path, receipt_jpg, prompt_dir, monkeypatch):
+    import httpx
+    from openai import RateLimitError
+    err = RateLimitError(
+        "rate limited",
+        response=httpx.Response(429, request=httpx.Request("POST", "https://api")),
+        body=None)
+
+    async def no_sleep(_delay):
+        pass
+    monkeypatch.setattr("shared.openai_client.asyncio.sleep", no_sleep)
+
+    client, calls = make_client(tmp_path, [err, VALID])
+    result = asyncio.run(client.extract_receipt_data(receipt_jpg, prompt_dir))
+    assert result["api_metadata"]["retry_count"] == 1
+    assert calls == [1, 1]  # no feedback message for transient errors
+
+
+def test_exhausted_retries_raise(tmp_path, receipt_jpg, prompt_dir):
+    client, calls = make_client(tmp_path, ["{a", "{b", "{c"])
+    with pytest.raises(json.JSONDecodeError):
+        asyncio.run(client.extract_receipt_data(receipt_jpg, prompt_dir))
+    assert calls == [1, 2, 3]
+
+
+def test_cache_hit_skips_api_call(tmp_path, receipt_jpg, prompt_dir):
+    cache_dir = tmp_path / "cache"
+    client, calls = make_client(tmp_path, [VALID])
+    client._response_cache = ResponseCache(cache_dir)
+    first = asyncio.run(client.extract_receipt_data(receipt_jpg, prompt_dir))
+    assert first["api_metadata"]["cache_hit"] is False
+    second = asyncio.run(client.extract_receipt_data(receipt_jpg, prompt_dir))
+    assert second["api_metadata"]["cache_hit"] is True
+    assert second["receipt_info"]["vendor"] == "ספק"
+    assert calls == [1]  # only the first run hit the (mock) API